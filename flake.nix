@@ -49,7 +49,7 @@
                 appdirs
                 argcomplete
                 pdfminer-six
-                html5lib
+                lxml
                 recipe-scrapers
                 pyyaml
               ]))
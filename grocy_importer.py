@@ -7,30 +7,38 @@ from __future__ import annotations
 from argparse import ArgumentParser, FileType
 import re
 from abc import (ABC, abstractmethod)
-from email.parser import Parser
+from email.parser import BytesParser
 from typing import (Union, Iterable, Mapping, Optional, TextIO, TypedDict,
-                    Literal, Callable, cast, Any, NotRequired, Tuple)
-from dataclasses import dataclass
-from itertools import groupby
+                    Literal, Callable, cast, Any, NotRequired, Tuple, IO,
+                    TYPE_CHECKING)
+from dataclasses import dataclass, field
+from collections import defaultdict
 from configparser import ConfigParser
 from os.path import join
 import sys
+import heapq
+from operator import attrgetter, itemgetter
+from itertools import groupby
+from difflib import get_close_matches
 import json
-from functools import partial
+from functools import partial, cached_property
+from concurrent.futures import ThreadPoolExecutor
 from logging import getLogger
 from datetime import datetime, timedelta
 from os import environ
 import webbrowser
 from shutil import copyfile
-import yaml
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads  # type: ignore[assignment]
 
-from bs4 import BeautifulSoup
 import requests
-from marshmallow import Schema, fields, EXCLUDE, post_load
+from requests.adapters import HTTPAdapter
 from appdirs import user_config_dir
-import argcomplete
-from pdfminer.high_level import extract_text
-from recipe_scrapers import scrape_me
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup, Tag
 
 
 logger = getLogger(__name__)
@@ -91,13 +99,6 @@ class GrocyLocation(TypedDict):
     name: str
 
 
-class GrocyProductGroup(TypedDict):
-    ''' A product group as returned from the Grocy API '''
-    id: int
-    name: str
-    description: str
-
-
 class GrocyShoppingLocation(TypedDict):
     ''' A shopping location as returned from the Grocy API '''
     id: int
@@ -186,40 +187,49 @@ class GrocyApi:
 
     def __init__(self, api_key: str, base_url: str, dry_run: bool, timeout: int
                  ):
-        self.headers = {'GROCY-API-KEY': api_key,
-                        'Content-type': 'application/json'}
+        self.session = requests.Session()
+        self.session.headers.update({'GROCY-API-KEY': api_key,
+                                     'Content-type': 'application/json'})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.base_url = base_url
         self.dry_run = dry_run
         self.only_active = {'query[]': ['active=1']}
         self.timeout = timeout
 
     def assert_valid_response(self, response: requests.Response) -> None:
-        if response.status_code//100 != 2:
-            try:
-                error_message = cast(GrocyErrorResponse,
-                                     response.json())['error_message']
-                raise UserError('Connection to Grocy failed with'
-                                f' {response.reason}: {error_message}')
-            except requests.exceptions.JSONDecodeError:
-                raise UserError('Connection to Grocy failed:'
-                                f' {response.reason}')
+        if 200 <= response.status_code < 300:
+            return
+        try:
+            error_message = cast(GrocyErrorResponse,
+                                 response.json())['error_message']
+        except requests.exceptions.JSONDecodeError:
+            raise UserError('Connection to Grocy failed:'
+                            f' {response.reason}') from None
+        raise UserError('Connection to Grocy failed with'
+                        f' {response.reason}: {error_message}')
 
     def get_all_product_barcodes(self) -> dict[str, GrocyProductBarCode]:
         ''' all product barcodes known to grocy '''
-        response = requests.get(self.base_url + '/objects/product_barcodes',
-                                headers=self.headers,
-                                timeout=self.timeout)
+        response = self.session.get(self.base_url
+                                    + '/objects/product_barcodes',
+                                    timeout=self.timeout)
+        self.assert_valid_response(response)
+        return {p['barcode']: p for p in json_loads(response.content)}
+
+    @cached_property
+    def products(self) -> list[GrocyProduct]:
+        ''' all (active) products known to grocy. Fetched only once. '''
+        response = self.session.get(self.base_url + '/objects/products',
+                                    params=self.only_active,
+                                    timeout=self.timeout)
         self.assert_valid_response(response)
-        return {p['barcode']: p for p in response.json()}
+        return cast(list[GrocyProduct], json_loads(response.content))
 
     def get_all_products(self) -> dict[str, GrocyProduct]:
         ''' all products known to grocy '''
-        response = requests.get(self.base_url + '/objects/products',
-                                headers=self.headers,
-                                params=self.only_active,
-                                timeout=self.timeout)
-        self.assert_valid_response(response)
-        return {p['name']: p for p in response.json()}
+        return {p['name']: p for p in self.products}
 
     def rearrange_by_id(self, by_name: dict[str, GrocyProduct]
                         ) -> dict[int, GrocyProduct]:
@@ -228,85 +238,82 @@ class GrocyApi:
 
     def get_all_products_by_id(self) -> dict[int, GrocyProduct]:
         ''' all products known to grocy '''
-        response = requests.get(self.base_url + '/objects/products',
-                                headers=self.headers,
-                                params=self.only_active,
-                                timeout=self.timeout)
-        self.assert_valid_response(response)
-        return {p['id']: p for p in response.json()}
+        return {p['id']: p for p in self.products}
 
-    def get_all_product_groups(self) -> dict[int, GrocyProductGroup]:
-        ''' all product groups known to grocy '''
-        response = requests.get(self.base_url + '/objects/product_groups',
-                                headers=self.headers,
-                                timeout=self.timeout)
-        self.assert_valid_response(response)
-        return {p['id']: p for p in response.json()}
+    def forget_cached(self) -> None:
+        ''' Fetch products and quantity units again on next use
 
-    def get_all_shopping_locations(self) -> Iterable[GrocyShoppingLocation]:
-        ''' all shopping locations known to grocy '''
-        response = requests.get(self.base_url + '/objects/shopping_locations',
-                                headers=self.headers,
-                                timeout=self.timeout)
+        Needed when they might have been changed in grocy in the meantime.
+        '''
+        self.__dict__.pop('products', None)
+        self.__dict__.pop('quantity_units', None)
+
+    def get_shopping_locations_like(self, name: str
+                                    ) -> Iterable[GrocyShoppingLocation]:
+        ''' shopping locations whose name contains `name` '''
+        response = self.session.get(self.base_url
+                                    + '/objects/shopping_locations',
+                                    params={'query[]': [f'name~{name}']},
+                                    timeout=self.timeout)
         self.assert_valid_response(response)
-        return cast(Iterable[GrocyShoppingLocation], response.json())
+        return cast(Iterable[GrocyShoppingLocation],
+                    json_loads(response.content))
 
     def get_location_names(self) -> Mapping[int, str]:
         ''' all (storage) locations known to grocy '''
-        response = requests.get(self.base_url + '/objects/locations',
-                                headers=self.headers,
-                                timeout=self.timeout)
+        response = self.session.get(self.base_url + '/objects/locations',
+                                    timeout=self.timeout)
         self.assert_valid_response(response)
         return {location['id']: location['name']
-                for location in cast(Iterable[GrocyLocation], response.json())}
+                for location in cast(Iterable[GrocyLocation],
+                                     json_loads(response.content))}
+
+    @cached_property
+    def quantity_units(self) -> list[GrocyQuantityUnit]:
+        ''' all quantity units known to grocy. Fetched only once. '''
+        response = self.session.get(self.base_url + '/objects/quantity_units',
+                                    timeout=self.timeout)
+        self.assert_valid_response(response)
+        return cast(list[GrocyQuantityUnit], json_loads(response.content))
 
     def get_all_quantity_units(self) -> Iterable[GrocyQuantityUnit]:
         ''' all quantity units known to grocy '''
-        response = requests.get(self.base_url + '/objects/quantity_units',
-                                headers=self.headers,
-                                timeout=self.timeout)
-        self.assert_valid_response(response)
-        return cast(Iterable[GrocyQuantityUnit], response.json())
+        return self.quantity_units
 
     def get_all_quantity_units_by_id(self) -> dict[int, GrocyQuantityUnit]:
         ''' all quantity units known to grocy '''
-        response = requests.get(self.base_url + '/objects/quantity_units',
-                                headers=self.headers,
-                                timeout=self.timeout)
-        self.assert_valid_response(response)
-        return {p['id']: p for p in response.json()}
+        return {p['id']: p for p in self.quantity_units}
 
     def get_all_quantity_unit_convertions(self
                                           ) -> Iterable[GrocyQUnitConvertion]:
         ''' all quantity unit convertions known to grocy '''
-        response = requests.get(self.base_url
-                                + '/objects/quantity_unit_conversions',
-                                headers=self.headers,
-                                timeout=self.timeout)
+        response = self.session.get(self.base_url
+                                    + '/objects/quantity_unit_conversions',
+                                    timeout=self.timeout)
         self.assert_valid_response(response)
-        return cast(Iterable[GrocyQUnitConvertion], response.json())
+        return cast(Iterable[GrocyQUnitConvertion],
+                    json_loads(response.content))
 
     def get_all_shopping_list(self) -> Iterable[GrocyShoppingListItem]:
         ''' all items on shopping lists '''
-        response = requests.get(self.base_url
-                                + '/objects/shopping_list',
-                                headers=self.headers,
-                                timeout=self.timeout)
+        response = self.session.get(self.base_url
+                                    + '/objects/shopping_list',
+                                    timeout=self.timeout)
         self.assert_valid_response(response)
-        return cast(Iterable[GrocyShoppingListItem], response.json())
+        return cast(Iterable[GrocyShoppingListItem],
+                    json_loads(response.content))
 
     def get_overdue_chores(self, now: datetime) -> Iterable[GrocyChore]:
         ''' all chores that are overdue '''
         params = {'query[]': ['next_estimated_execution_time<'
                               + now.strftime('%F %T')],
                   'order': 'next_estimated_execution_time'}
-        response = requests.get(self.base_url
-                                + '/chores',
-                                headers=self.headers,
-                                params=params,
-                                timeout=self.timeout)
+        response = self.session.get(self.base_url
+                                    + '/chores',
+                                    params=params,
+                                    timeout=self.timeout)
         self.assert_valid_response(response)
-        return cast(Iterable[GrocyChore], response.json())
+        return cast(Iterable[GrocyChore], json_loads(response.content))
 
     def get_scheduled_manual_chores(self, now: datetime, get_all: bool = False
                                     ) -> Iterable[GrocyChoreFull]:
@@ -319,22 +326,21 @@ class GrocyApi:
                               if not get_all
                               else ['active=1']),
                   'order': 'rescheduled_date'}
-        response = requests.get(f'{self.base_url}/objects/chores',
-                                headers=self.headers,
-                                params=params,
-                                timeout=self.timeout)
+        response = self.session.get(f'{self.base_url}/objects/chores',
+                                    params=params,
+                                    timeout=self.timeout)
         self.assert_valid_response(response)
-        return cast(Iterable[GrocyChoreFull], response.json())
+        return cast(Iterable[GrocyChoreFull], json_loads(response.content))
 
     def schedule_chore(self, chore_id: int, date_time: GrocyDateTime
                        ) -> None:
         if self.dry_run:
             return
         data = {'rescheduled_date': date_time}
-        response = requests.put(f'{self.base_url}/objects/chores/{chore_id}',
-                                headers=self.headers,
-                                json=data,
-                                timeout=self.timeout)
+        response = self.session.put(f'{self.base_url}/objects/chores'
+                                    f'/{chore_id}',
+                                    json=data,
+                                    timeout=self.timeout)
         self.assert_valid_response(response)
 
     def did_chore(self, chore_id: int, tracked_time: Optional[str],
@@ -352,12 +358,12 @@ class GrocyApi:
                 else {'tracked_time': tracked_time,
                       'done_by': 0, 'skipped': skip})
         logger.debug(data)
-        response = requests.post(f'{self.base_url}/chores/{chore_id}/execute',
-                                 headers=self.headers,
-                                 json=data,
-                                 timeout=self.timeout)
+        response = self.session.post(f'{self.base_url}/chores'
+                                     f'/{chore_id}/execute',
+                                     json=data,
+                                     timeout=self.timeout)
         self.assert_valid_response(response)
-        return cast(GrocyChoreCompleted, response.json())
+        return cast(GrocyChoreCompleted, json_loads(response.content))
 
     def charge_battery(self, battery_id: int, tracked_time: Optional[str]
                        ) -> None:
@@ -368,31 +374,29 @@ class GrocyApi:
                 if tracked_time is None
                 else {'tracked_time': tracked_time})
         logger.debug(data)
-        response = requests.post(f'{self.base_url}/batteries'
-                                 f'/{battery_id}/charge',
-                                 headers=self.headers,
-                                 json=data,
-                                 timeout=self.timeout)
+        response = self.session.post(f'{self.base_url}/batteries'
+                                     f'/{battery_id}/charge',
+                                     json=data,
+                                     timeout=self.timeout)
         self.assert_valid_response(response)
 
     def get_chore(self, chore_id: int) -> GrocyChoreFull:
         ''' Get a chore from grocy '''
         url = f'{self.base_url}/chores/{chore_id}'
-        response = requests.get(url,
-                                headers=self.headers,
-                                timeout=self.timeout)
+        response = self.session.get(url,
+                                    timeout=self.timeout)
         self.assert_valid_response(response)
-        return cast(GrocyChoreFull, response.json()["chore"])
+        return cast(GrocyChoreFull, json_loads(response.content)["chore"])
 
     def get_chore_due(self, chore_id: int) -> GrocyDateTime:
         ''' Get a chore's due date from grocy '''
         url = f'{self.base_url}/chores/{chore_id}'
-        response = requests.get(url,
-                                headers=self.headers,
-                                timeout=self.timeout)
+        response = self.session.get(url,
+                                    timeout=self.timeout)
         self.assert_valid_response(response)
         return cast(GrocyDateTime,
-                    response.json()["next_estimated_execution_time"])
+                    json_loads(response.content)
+                    ["next_estimated_execution_time"])
 
     def purchase(self, product_id: int, amount: float, price: float,
                  shopping_location_id: int) -> None:
@@ -400,34 +404,31 @@ class GrocyApi:
         if self.dry_run:
             return
         call = f'/stock/products/{product_id}/add'
-        response = requests.post(self.base_url + call,
-                                 headers=self.headers,
-                                 json={'amount': amount,
-                                       'price': price,
-                                       'transaction_type': 'purchase',
-                                       'shopping_location_id':
-                                       shopping_location_id
-                                       },
-                                 timeout=self.timeout)
+        response = self.session.post(self.base_url + call,
+                                     json={'amount': amount,
+                                           'price': price,
+                                           'transaction_type': 'purchase',
+                                           'shopping_location_id':
+                                           shopping_location_id
+                                           },
+                                     timeout=self.timeout)
         self.assert_valid_response(response)
 
     def get_user_fields(self, entity: str, object_id: int) -> GrocyUserFields:
         ''' Gets a Grocy user field '''
         call = f'/userfields/{entity}/{object_id}'
-        response = requests.get(self.base_url + call,
-                                headers=self.headers,
-                                timeout=self.timeout)
+        response = self.session.get(self.base_url + call,
+                                    timeout=self.timeout)
         self.assert_valid_response(response)
-        return cast(GrocyUserFields, response.json())
+        return cast(GrocyUserFields, json_loads(response.content))
 
     def set_userfields(self, entity: str, object_id: int,
                        user_fields: dict[str, object]) -> None:
         ''' Sets a Grocy user field '''
         call = f'/userfields/{entity}/{object_id}'
-        response = requests.put(self.base_url + call,
-                                headers=self.headers,
-                                timeout=self.timeout,
-                                data=json.dumps(user_fields))
+        response = self.session.put(self.base_url + call,
+                                    timeout=self.timeout,
+                                    data=json.dumps(user_fields))
         self.assert_valid_response(response)
 
 
@@ -448,7 +449,7 @@ class CliArgs(AppArgs):
     ''' Structure of our CLI args '''
     regex: str
     store: Literal['netto', 'rewe']
-    file: TextIO
+    file: IO[Any]
     file_path: str
     order: int
     url: str
@@ -468,11 +469,15 @@ class TodotxtArgs(AppArgs):
 
 
 def normanlize_white_space(orig: str) -> str:
-    ''' Remove multiple white space '''
-    return re.sub(r'\s+', ' ', orig).strip()
+    r''' Remove multiple white space
+
+    >>> normanlize_white_space('  Milch\t 1,5%\n\xa0 1L ')
+    'Milch 1,5% 1L'
+    '''
+    return ' '.join(orig.split())
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Purchase:
     ''' Represents an item purchased.
 
@@ -483,6 +488,58 @@ class Purchase:
     name: str
 
 
+def describe_unknown(item: Purchase, known_names: Iterable[str]) -> str:
+    ''' Describe an unknown purchase along with similar known names
+
+    >>> describe_unknown(Purchase(1, 1.0, 'Milch 1,5%'),
+    ...                  ['Milch 1.5 %', 'Brot'])
+    "Purchase(amount=1, price=1.0, name='Milch 1,5%') similar: Milch 1.5 %"
+    >>> describe_unknown(Purchase(1, 1.0, 'Mehl'), ['Brot'])
+    "Purchase(amount=1, price=1.0, name='Mehl')"
+    '''
+    similar = get_close_matches(item.name, known_names, n=3, cutoff=0.8)
+    return f'{item} similar: {", ".join(similar)}' if similar else str(item)
+
+
+def wait_for_unknown(groceries: list[Purchase],
+                     barcodes: dict[str, GrocyProductBarCode],
+                     fetch_barcodes: Callable[[],
+                                              dict[str, GrocyProductBarCode]]
+                     ) -> bool:
+    ''' Ask until grocy has a barcode for every purchased item
+
+    Updates `barcodes` with what `fetch_barcodes` returns after each prompt
+    and tells whether the user had to be asked at all.
+
+    >>> from unittest.mock import patch
+    >>> barcodes = {}
+    >>> fetched = iter([{}, {'Milch 1,5% 1L': {}}])
+    >>> with patch('builtins.input') as prompt, patch('sys.stderr'):
+    ...     wait_for_unknown([Purchase(1, 1.0, 'Milch 1,5% 1L')], barcodes,
+    ...                      lambda: next(fetched))
+    ...     prompt.call_count
+    True
+    2
+    >>> list(barcodes)
+    ['Milch 1,5% 1L']
+    '''
+    unknown = {item.name
+               for item in groceries
+               if item.name not in barcodes}
+    if not unknown:
+        return False
+    while unknown:
+        print('Unknown products. Please add to grocy:', file=sys.stderr)
+        print('\n'.join(describe_unknown(item, barcodes)
+                        for item in groceries
+                        if item.name in unknown),
+              file=sys.stderr)
+        input('...')
+        barcodes.update(fetch_barcodes())
+        unknown.difference_update(barcodes)
+    return True
+
+
 def simplify(items: Iterable[Purchase]
              ) -> list[Purchase]:
     '''
@@ -502,17 +559,23 @@ def simplify(items: Iterable[Purchase]
     ... #doctest: +NORMALIZE_WHITESPACE
     [Purchase(amount=1, price=2.0, name='Mehl'),
      Purchase(amount=2, price=1.0, name='Milch')]
+    >>> simplify([n._parse_purchase(['Milch', '1,10']),
+    ...           n._parse_purchase(['Milch', '1,00']),
+    ...           n._parse_purchase(['Milch', '1,10'])])
+    ... #doctest: +NORMALIZE_WHITESPACE
+    [Purchase(amount=1, price=1.0, name='Milch'),
+     Purchase(amount=2, price=1.1, name='Milch')]
     >>> simplify([n._parse_purchase(['Punkte-Gutschein', '-1,05'])])
     []
 
     '''
-    return [Purchase(sum(p.amount for p in g),
-                     price,
-                     name)
-            for (name, price), g
-            in groupby(sorted(items, key=lambda p: p.name),
-                       lambda p: (p.name, p.price))
-            if float(price) >= 0]
+    amounts: defaultdict[tuple[str, float],
+                         Union[int, float]] = defaultdict(int)
+    for p in items:
+        if p.price >= 0:
+            amounts[(p.name, p.price)] += p.amount
+    return [Purchase(amount, price, name)
+            for (name, price), amount in sorted(amounts.items())]
 
 
 class Store(ABC):
@@ -553,6 +616,10 @@ class Store(ABC):
                                         type=str,
                                         metavar='file',
                                         help=self.store_info.file_help_msg)
+            elif self.store_info.binary_file:
+                subcommand.add_argument('file',
+                                        type=FileType('rb'),
+                                        help=self.store_info.file_help_msg)
             else:
                 subcommand.add_argument('file',
                                         type=FileType('r', encoding='utf-8'),
@@ -578,44 +645,55 @@ class Store(ABC):
                         config: AppConfig,
                         grocy: GrocyApi) -> None:
         ''' help importing purchases into grocy '''
-        groceries = self.get_purchase(args)
-        barcodes = grocy.get_all_product_barcodes()
-        shopping_location = get_shopping_location_id(args.store, config, grocy)
-        factor = partial(convert_unit,
-                         grocy.get_all_quantity_unit_convertions())
-        while any(unknown_items := [str(item)
-                                    for item in groceries
-                                    if item.name not in barcodes]):
-            print('Unknown products. Please add to grocy:', file=sys.stderr)
-            print('\n'.join(unknown_items), file=sys.stderr)
-            input('...')
-            barcodes = grocy.get_all_product_barcodes()
-        products = grocy.get_all_products_by_id()
-        grocy_purchases = []
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            barcodes_future = executor.submit(grocy.get_all_product_barcodes)
+            products_future = executor.submit(grocy.get_all_products_by_id)
+            location_future = executor.submit(get_shopping_location_id,
+                                              args.store, config, grocy)
+            convertions_future = executor.submit(
+                grocy.get_all_quantity_unit_convertions)
+            groceries = self.get_purchase(args)
+            barcodes = barcodes_future.result()
+            products = products_future.result()
+            shopping_location = location_future.result()
+            factor = partial(convert_unit,
+                             index_convertions(convertions_future.result()))
+        if wait_for_unknown(groceries, barcodes,
+                            grocy.get_all_product_barcodes):
+            grocy.forget_cached()
+            products = grocy.get_all_products_by_id()
+        grocy_purchases: list[tuple[int, float, float, int]] = []
         for item in groceries:
             try:
                 pro = barcodes[item.name]
-                grocy_purchases.append(partial(grocy.purchase,
-                                               pro['product_id'],
-                                               item.amount
-                                               * pro['amount']
-                                               * factor(pro['qu_id'],
-                                                        products[pro
-                                                                 ['product_id'
-                                                                  ]
-                                                                 ]
-                                                        ['qu_id_stock'],
-                                                        pro['product_id']),
-                                               item.price / item.amount,
-                                               shopping_location
-                                               ))
+                product_id = pro['product_id']
+                grocy_purchases.append((product_id,
+                                        item.amount
+                                        * pro['amount']
+                                        * factor(pro['qu_id'],
+                                                 products[product_id]
+                                                 ['qu_id_stock'],
+                                                 product_id),
+                                        item.price / item.amount,
+                                        shopping_location))
             except Exception:
                 print(f'Failed {item}')
                 raise
             logger.debug('Prepared %s', item)
-        for func, item in zip(grocy_purchases, groceries):
-            func()
-            print(f'Added {item}')
+        failure: Optional[Exception] = None
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(grocy.purchase, *purchase)
+                       for purchase in grocy_purchases]
+            for item, future in zip(groceries, futures):
+                try:
+                    future.result()
+                except Exception as ex:
+                    print(f'Failed {item}')
+                    failure = failure or ex
+                else:
+                    print(f'Added {item}')
+        if failure is not None:
+            raise failure
 
 
 @dataclass
@@ -626,6 +704,12 @@ class StoreSubcommandInfo:
     file_help_msg: str
     includes_history: bool = False
     use_file_path: bool = False
+    binary_file: bool = False
+
+
+REWE_IGNORED_TITLES = frozenset(['TimeSlot',
+                                 'Enthaltene Pfandbeträge',
+                                 'Getränke-Sperrgutaufschlag'])
 
 
 class Rewe(Store):
@@ -642,24 +726,23 @@ class Rewe(Store):
             This only includes purches that were made via the Liefer- or
             Abholservice. For in store purchases see ebon.
             ''',
-            includes_history=True)
+            includes_history=True,
+            binary_file=True)
 
     def list_purchases(self, _args: CliArgs, *_: Any) -> None:
-        print('\n'.join(ReweJsonSchema.load_from_json_file(_args.file
-                                                           ).list_orders()
+        print('\n'.join(ReweJson.load_from_json_file(_args.file,
+                                                     line_items=False
+                                                     ).list_orders()
                         ))
 
     def get_purchase(self, args: CliArgs) -> list[Purchase]:
-        data = ReweJsonSchema.load_from_json_file(args.file)
+        data = ReweJson.load_from_json_file(args.file)
         return [Purchase(line_item.quantity,
                          line_item.total_price / 100,
                          line_item.title)
-                for line_item in data.sorted_orders()[args.order-1
-                                                      ].sub_orders[0
-                                                                   ].line_items
-                if line_item.title not in ['TimeSlot',
-                                           'Enthaltene Pfandbeträge',
-                                           'Getränke-Sperrgutaufschlag']]
+                for line_item in data.nth_order(args.order
+                                                ).sub_orders[0].line_items
+                if line_item.title not in REWE_IGNORED_TITLES]
 
     def get_subcommands(self, store: Any) -> Iterable[Any]:
         yield from super().get_subcommands(store)
@@ -681,6 +764,10 @@ class Rewe(Store):
                             f" {units[p['qu_id']]['name_plural']}")
 
 
+EBON_LINE_REGEX = re.compile(r'^(?:(\d+)x \d+,\d\d\s+)?(.*?)\s+'
+                             r'(\d+,\d\d)\s+[12]')
+
+
 class Ebon(Store):
     'The receipt as PDF from diffent German stores (dm, Netto, or Rewe)'
 
@@ -698,6 +785,7 @@ class Ebon(Store):
                 )
 
     def get_purchase(self, args: CliArgs) -> list[Purchase]:
+        from pdfminer.high_level import extract_text
         return list(self._get_purchases(extract_text(args.file_path)))
 
     @staticmethod
@@ -736,20 +824,23 @@ class Ebon(Store):
          Purchase(amount=4, price=5.0, name='dmBio Milch 1,5% 1L'),
          Purchase(amount=2, price=3.9, name='Dental Delight ZC Pola')]
         '''
-        regex = re.compile(r'^(?:(\d+)x \d+,\d\d\s+)?(.*?)\s+'
-                           r'(\d+,\d\d)\s+[12]')
         for line in ebon.splitlines()[1:]:
             if line.startswith('SUMME '):
                 break
             if len(line) == 0:
                 continue
-            match_ = regex.search(line)
+            match_ = EBON_LINE_REGEX.search(line)
             assert match_ is not None
             yield Purchase(int(match_.group(1) or 1),
                            float(match_.group(3).replace(',', '.')),
                            match_.group(2))
 
 
+EMAIL_PARSER = BytesParser()
+NETTO_IGNORED_ROW_REGEX = re.compile('Filiale|Rabatt|DeutschlandCard'
+                                     '|Punkte-Gutschein')
+
+
 class Netto(Store):
     'German discount supermarket chain Netto Marken-Discount'
 
@@ -762,7 +853,7 @@ class Netto(Store):
             supermarket chain Netto Marken-Discount
             ''',
             'Path to an e-mail with the "digitaler Kassenbon"',
-            )
+            binary_file=True)
 
     def get_purchase(self, args: CliArgs) -> list[Purchase]:
         ''' Import from Netto Marken-Discount
@@ -770,33 +861,58 @@ class Netto(Store):
         Import a "digitaler Kassenbon" email from the German discount
         supermarket chain Netto Marken-Discount
         '''
-        email = Parser().parse(args.file)
-        html = list(part
-                    for part in email.walk()
-                    if part.get_content_type() == 'text/html'
-                    )[0].get_payload(decode=True)
-        soup = BeautifulSoup(cast(bytes, html), 'html5lib')
-        purchase = list(column.get_text()
-                        for row
-                        in soup.select(' '.join(7*["tbody"] + ["tr"]))
-                        if not list(row.select('td')
-                                    )[0].get_text().endswith(':')
-                        and not any(keyword in row.get_text()
-                                    for keyword in ['Filiale', 'Rabatt',
-                                                    'DeutschlandCard',
-                                                    'Punkte-Gutschein'])
-                        for column in row.select('td')
-                        if column.get_text() != ''
-                        )
-        items: list[list[str]] = []
-        for pur in purchase:
-            if pur.isspace():
-                items.append([])
-            else:
-                items[-1].append(pur)
+        from bs4 import BeautifulSoup, SoupStrainer
+        import soupsieve
+        cell_selector = soupsieve.compile('td')
+        receipt_strainer = SoupStrainer(['table', 'tbody', 'tr', 'td'])
+        email = EMAIL_PARSER.parse(args.file)
+        html_part = next((part
+                          for part in email.walk()
+                          if part.get_content_type() == 'text/html'),
+                         None)
+        if html_part is None:
+            raise UserError('The email has no HTML part.')
+        html = cast(bytes, html_part.get_payload(decode=True))
+        rows = self._receipt_rows(BeautifulSoup(
+            html, 'lxml',
+            from_encoding=html_part.get_content_charset(),
+            parse_only=receipt_strainer))
+        purchase: list[str] = []
+        for row in rows:
+            texts = [column.get_text()
+                     for column in cell_selector.select(row)]
+            if (texts[0].endswith(':')
+                    or NETTO_IGNORED_ROW_REGEX.search(''.join(texts))):
+                continue
+            purchase.extend(text for text in texts if text != '')
+        items = (list(group)
+                 for is_separator, group in groupby(purchase, str.isspace)
+                 if not is_separator)
         return simplify(self._parse_purchase(item)
                         for item in items if len(item) > 1)
 
+    @staticmethod
+    def _receipt_rows(soup: BeautifulSoup) -> list[Tag]:
+        ''' Table rows nested in at least 7 tables
+
+        Counts tables rather than tbody elements, as lxml only has those
+        that are written out in the HTML.
+
+        >>> from bs4 import BeautifulSoup
+        >>> def nested(html: str) -> str:
+        ...     for _ in range(6):
+        ...         html = f'<table><tr><td>{html}</td></tr></table>'
+        ...     return html
+        >>> soup = BeautifulSoup(nested(
+        ...     '<table><tbody><tr><td>Brot</td></tr></tbody></table>'
+        ...     '<table><tr><td>Milch</td></tr></table>'), 'lxml')
+        >>> [row.get_text() for row in Netto._receipt_rows(soup)]
+        ['Brot', 'Milch']
+        '''
+        return [row
+                for row in soup.find_all('tr')
+                if sum(parent.name == 'table' for parent in row.parents) >= 7]
+
     def _parse_purchase(self, args: list[str]) -> Purchase:
         ''' Parse a Netto store purchase '''
         return (Purchase(1,
@@ -808,71 +924,124 @@ class Netto(Store):
                               normanlize_white_space(args[1])))
 
     def _from_netto_price(self, netto_price: str) -> float:
-        ''' convert from Netto store price format to grocy's '''
-        return float(netto_price.split()[0].replace(',', '.'))
+        ''' convert from Netto store price format to grocy's
 
+        >>> Netto()._from_netto_price(' -1,05 €')
+        -1.05
+        '''
+        return float(netto_price.split(maxsplit=1)[0].replace(',', '.'))
 
-@dataclass
+
+@dataclass(slots=True)
 class ReweJsonLineItem:
     ''' Represents data from "Meine REWE-Shop-Daten.json" '''
-    price: int
+    # price: int
     quantity: int
     title: str
     total_price: int
 
+    @staticmethod
+    def from_json(data: Any) -> ReweJsonLineItem:
+        ''' Create instance from deserialized data '''
+        return ReweJsonLineItem(int(data['quantity']),
+                                data['title'],
+                                int(data['totalPrice']))
+
 
-@dataclass
+@dataclass(slots=True)
 class ReweJsonSuborder:
     ''' Represents data from "Meine REWE-Shop-Daten.json" '''
-    delivery_type: str
-    # coupons: fields.List()
+    # delivery_type: str
+    # coupons: list
     # merchantInfo: object
-    order_type: str
-    payback_number: Optional[str]
-    channel: str
+    # order_type: str
+    # payback_number: Optional[str]
+    # channel: str
     # deliveryAddress: object
-    sub_order_value: int
+    # sub_order_value: int
     line_items: list[ReweJsonLineItem]
     # timeSlot: object
-    additional_email: str
-    user_comment: str
+    # additional_email: str
+    # user_comment: str
     merchant: str
 
+    @staticmethod
+    def from_json(data: Any, line_items: bool = True) -> ReweJsonSuborder:
+        ''' Create instance from deserialized data '''
+        return ReweJsonSuborder([ReweJsonLineItem.from_json(line_item)
+                                 for line_item in data['lineItems']]
+                                if line_items else [],
+                                data['merchant'])
+
 
-@dataclass
+@dataclass(slots=True)
 class ReweJsonOrder:
     ''' Represents data from "Meine REWE-Shop-Daten.json" '''
-    # payments: fields.List()
+    # payments: list
     # invoiceAddress: object
     order_value: int
-    client_info: str
+    # client_info: str
     # paymentInfo: object
     sub_orders: list[ReweJsonSuborder]
     # OrderId: str
     creation_date: str
 
+    @staticmethod
+    def from_json(data: Any, line_items: bool = True) -> ReweJsonOrder:
+        ''' Create instance from deserialized data '''
+        return ReweJsonOrder(int(data['orderValue']),
+                             [ReweJsonSuborder.from_json(sub_order,
+                                                         line_items)
+                              for sub_order in data['subOrders']],
+                             data['creationDate'])
+
 
-@dataclass
+@dataclass(slots=True)
 class ReweJsonOrdersList:
     ''' Represents data from "Meine REWE-Shop-Daten.json" '''
     orders: list[ReweJsonOrder]
 
+    @staticmethod
+    def from_json(data: Any, line_items: bool = True) -> ReweJsonOrdersList:
+        ''' Create instance from deserialized data '''
+        return ReweJsonOrdersList([ReweJsonOrder.from_json(order, line_items)
+                                   for order in data['orders']])
+
 
-@dataclass
+@dataclass(slots=True)
 class ReweJson:
     ''' Represents data from "Meine REWE-Shop-Daten.json" '''
-    # addressData: fields.List()
-    # deliveryflats: fields.List()
+    # addressData: list
+    # deliveryflats: list
     # payback: object
     # customerData: object
     # paymentData: object
     orders: ReweJsonOrdersList
     # coupons: object
 
+    @staticmethod
+    def load_from_json_file(file: IO[bytes], line_items: bool = True
+                            ) -> ReweJson:
+        ''' Load data from given json file
+
+        Without `line_items` the sub orders are loaded with empty line items,
+        which is enough for listing the orders.
+        '''
+        return ReweJson(ReweJsonOrdersList.from_json(
+            json_loads(file.read())['orders'], line_items))
+
     def sorted_orders(self) -> list[ReweJsonOrder]:
         ''' Sort orders by creation_date '''
         return sorted(self.orders.orders,
-                      key=lambda x: x.creation_date, reverse=True)
+                      key=attrgetter('creation_date'), reverse=True)
+
+    def nth_order(self, n: int) -> ReweJsonOrder:
+        ''' The n-th latest order, starting with 1 '''
+        latest = heapq.nlargest(n, self.orders.orders,
+                                key=attrgetter('creation_date'))
+        if n < 1 or len(latest) < n:
+            raise UserError(f'There is no order {n}.')
+        return latest[-1]
 
     def list_orders(self) -> Iterable[str]:
         ''' Format and sort orders for displaying to human '''
@@ -884,102 +1053,18 @@ class ReweJson:
                    f' {int(value) / 100} €')
 
 
-class ReweJsonLineItemSchema(Schema):
-    ''' Represents data from "Meine REWE-Shop-Daten.json" '''
-    price = fields.Integer()
-    quantity = fields.Integer()
-    title = fields.Str()
-    total_price = fields.Integer(data_key="totalPrice")
-
-    @post_load
-    def make(self, data: Any, **_: Any) -> ReweJsonLineItem:
-        ''' Create instance from deserialized data '''
-        return ReweJsonLineItem(**data)
-
-
-class ReweJsonSuborderSchema(Schema):
-    ''' Represents data from "Meine REWE-Shop-Daten.json" '''
-    delivery_type = fields.Str(data_key="deliveryType")
-    # coupons = fields.List()
-    # merchantInfo: object
-    order_type = fields.Str(data_key="orderType")
-    payback_number = fields.Str(allow_none=True, data_key="paybackNumber")
-    channel = fields.Str()
-    # deliveryAddress: object
-    sub_order_value = fields.Integer(data_key="subOrderValue")
-    line_items = fields.List(fields.Nested(ReweJsonLineItemSchema,
-                                           unknown=EXCLUDE),
-                             data_key="lineItems")
-    # timeSlot: object
-    additional_email = fields.Str(data_key="additionalEmail")
-    user_comment = fields.Str(data_key="userComment")
-    merchant = fields.Str()
-
-    @post_load
-    def make(self, data: Any, **_: Any) -> ReweJsonSuborder:
-        ''' Create instance from deserialized data '''
-        return ReweJsonSuborder(**data)
-
-
-class ReweJsonOrderSchema(Schema):
-    ''' Represents data from "Meine REWE-Shop-Daten.json" '''
-    # payments = fields.List()
-    # invoiceAddress: object
-    order_value = fields.Integer(data_key="orderValue")
-    client_info = fields.Str(data_key="clientInfo")
-    # paymentInfo: object
-    sub_orders = fields.List(fields.Nested(ReweJsonSuborderSchema,
-                                           unknown=EXCLUDE),
-                             data_key="subOrders")
-    # OrderId = fields.Str()
-    creation_date = fields.Str(data_key="creationDate")
-
-    @post_load
-    def make(self, data: Any, **_: Any) -> ReweJsonOrder:
-        ''' Create instance from deserialized data '''
-        return ReweJsonOrder(**data)
-
-
-class ReweJsonOrdersListSchema(Schema):
-    ''' Represents data from "Meine REWE-Shop-Daten.json" '''
-    orders = fields.List(fields.Nested(ReweJsonOrderSchema, unknown=EXCLUDE))
-
-    @post_load
-    def make(self, data: Any, **_: Any) -> ReweJsonOrdersList:
-        ''' Create instance from deserialized data '''
-        return ReweJsonOrdersList(**data)
-
-
-class ReweJsonSchema(Schema):
-    ''' Represents data from "Meine REWE-Shop-Daten.json" '''
-    # addressData = fields.List()
-    # deliveryflats = fields.List()
-    # payback: object
-    # customerData: object
-    # paymentData: object
-    orders = fields.Nested(ReweJsonOrdersListSchema, unknown=EXCLUDE)
-    # coupons: object
-
-    @staticmethod
-    def load_from_json_file(file: TextIO) -> ReweJson:
-        ''' Load data from given json file '''
-        return cast(ReweJson,
-                    ReweJsonSchema(unknown=EXCLUDE).load(json.load(file),
-                                                         unknown=EXCLUDE))
-
-    @post_load
-    def make(self, data: Any, **_: Any) -> ReweJson:
-        ''' Create instance from deserialized data '''
-        return ReweJson(**data)
-
-
-@dataclass
+@dataclass(slots=True)
 class UnparseableIngredient:
     ''' Represents an ingredient as listed in a recipe from the web. '''
     full: str
 
 
-@dataclass
+INGREDIENT_REGEX = re.compile(r'^\s*(¼|½|¾|\d+(?:\s+(?:\-\s+\d+|½))?)'
+                              r'(?:\s+(\S*[^\s,]))?'
+                              r'(?:\s+([^,(]*[^,(\s]).*)$')
+
+
+@dataclass(slots=True)
 class Ingredient:
     ''' Represents an ingredient as listed in a recipe from the web. '''
     amount: str
@@ -1031,21 +1116,19 @@ class Ingredient:
         Ingredient(amount='3 ½', unit='TL', name='Salz',
                    full='3 ½ TL Salz')
         '''
-        match_ = re.search(r'^\s*(¼|½|¾|\d+(?:\s+(?:\-\s+\d+|½))?)'
-                           r'(?:\s+(\S*[^\s,]))?'
-                           r'(?:\s+([^,(]*[^,(\s]).*)$',
-                           text)
+        match_ = INGREDIENT_REGEX.search(text)
         if match_ is None:
             return UnparseableIngredient(text)
         return Ingredient(match_.group(1),
                           match_.group(2) or '',
                           match_.group(3) or '',
-                          match_.group(0))
+                          text)
 
 
 def recipe_ingredients(url: str, timeout: int
                        ) -> list[Union[Ingredient, UnparseableIngredient]]:
     ''' Find all ingrediant of the recipe '''
+    from recipe_scrapers import scrape_me
     scrapper = scrape_me(url, timeout=timeout, wild_mode=True)
     ingredients = [Ingredient.parse(normanlize_white_space(item)
                                     )
@@ -1053,7 +1136,7 @@ def recipe_ingredients(url: str, timeout: int
     return ingredients
 
 
-@dataclass
+@dataclass(slots=True)
 class NormalizedIngredientsResult:
     ''' Categorized Ingredients  '''
     product_unknown: list[UnparseableIngredient | Ingredient]
@@ -1067,13 +1150,13 @@ class NormalizedIngredientsResult:
         print('\nUnknown units:')
         print('\n'.join(str(ingred)
                         for ingred, units in self.matching_units
-                        if not any(units)))
+                        if not units))
         print('\nUnknown unit convertion:')
         print('\n'.join(str(ingred)
                         for ingred in self.unit_convertion_unknown))
 
 
-@dataclass
+@dataclass(slots=True)
 class IngredientNormalizer:
     ''' Convert ingredients from the store into our grocy names and units
     '''
@@ -1082,6 +1165,32 @@ class IngredientNormalizer:
     products_by_id: dict[int, GrocyProduct]
     units: Iterable[GrocyQuantityUnit]
     convertions: Iterable[GrocyQUnitConvertion]
+    convertion_keys: set[tuple[int, int, Optional[int]]] = field(init=False)
+    products_by_lower_name: dict[str, GrocyProduct] = field(init=False)
+    units_by_id: dict[int, GrocyQuantityUnit] = field(init=False)
+    units_by_name: dict[str, list[GrocyQuantityUnit]] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.units_by_id = {}
+        self.units_by_name = {}
+        for unit in self.units:
+            self.units_by_id[unit['id']] = unit
+            for name in {unit['name'], unit['name_plural']}:
+                self.units_by_name.setdefault(name, []).append(unit)
+        self.products_by_lower_name = {n.lower(): p
+                                       for (n, p) in self.products.items()}
+        self.convertion_keys = {(c['from_qu_id'], c['to_qu_id'],
+                                 c['product_id'])
+                                for c in self.convertions}
+
+    def is_convertible(self, product: GrocyProduct, unit_ids: set[int]
+                       ) -> bool:
+        ''' Can any of the given units be converted to the stock unit '''
+        stock = product['qu_id_stock']
+        return (stock in unit_ids
+                or any((unit_id, stock, product_id) in self.convertion_keys
+                       for unit_id in unit_ids
+                       for product_id in (product['id'], None)))
 
     def apply_alias(self, ingredient: Ingredient,
                     ) -> Ingredient:
@@ -1089,7 +1198,7 @@ class IngredientNormalizer:
         alias = self.barcodes[ingredient.name]
         unit = (ingredient.unit
                 if ingredient.unit != ''
-                else {u['id']: u['name'] for u in self.units}[alias['qu_id']])
+                else self.units_by_id[alias['qu_id']]['name'])
         return Ingredient(ingredient.amount,
                           unit,
                           self.products_by_id[alias['product_id']]['name'],
@@ -1102,7 +1211,7 @@ class IngredientNormalizer:
         ''' Normalize given ingredients with grocy '''
         product_known = []
         product_unknown: list[Union[Ingredient, UnparseableIngredient]] = []
-        grocy_products = {n.lower(): p for (n, p) in self.products.items()}
+        grocy_products = self.products_by_lower_name
         for ingred in ingredients:
             if isinstance(ingred, UnparseableIngredient):
                 product_unknown.append(ingred)
@@ -1114,31 +1223,14 @@ class IngredientNormalizer:
                     product_unknown.append(ingred)
             else:
                 product_known.append(ingred)
-        matching_units = [(ingred, [unit
-                                    for unit in self.units
-                                    if ingred.unit in [unit['name'],
-                                                       unit['name_plural']]
-                                    ])
+        matching_units = [(ingred, self.units_by_name.get(ingred.unit, []))
                           for ingred in product_known]
         convertion_unknown = [ingred
                               for ingred, units in matching_units
-                              if any(units)
-                              and not any(grocy_products[ingred.name
-                                                         ]['qu_id_stock']
-                                          == u['id']
-                                          for u in units)
-                              and not any(u['id'] == c['from_qu_id']
-                                          and c['to_qu_id']
-                                          == grocy_products[ingred.name.lower()
-                                                            ]['qu_id_stock']
-                                          and c['product_id'
-                                                ] in [grocy_products[ingred
-                                                                     .name
-                                                                     .lower()
-                                                                     ]['id'],
-                                                      None]
-                                          for u in units
-                                          for c in self.convertions)]
+                              if units
+                              and not self.is_convertible(
+                                  grocy_products[ingred.name.lower()],
+                                  {u['id'] for u in units})]
         return NormalizedIngredientsResult(product_unknown,
                                            matching_units,
                                            convertion_unknown)
@@ -1152,13 +1244,19 @@ def recipe_ingredients_checker(args: CliArgs,
     Check if ingredients and their units are known to grocy for a recipe to be
     imported
     '''
-    ingredients = recipe_ingredients(args.url, args.timeout)
-    logger.info("Found %s ingredients", len(ingredients))
-    products = grocy.get_all_products()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        products_future = executor.submit(grocy.get_all_products)
+        units_future = executor.submit(grocy.get_all_quantity_units)
+        convertions_future = executor.submit(
+            grocy.get_all_quantity_unit_convertions)
+        barcodes_future = executor.submit(grocy.get_all_product_barcodes)
+        ingredients = recipe_ingredients(args.url, args.timeout)
+        logger.info("Found %s ingredients", len(ingredients))
+        products = products_future.result()
+        units = units_future.result()
+        convertions = convertions_future.result()
+        barcodes = barcodes_future.result()
     products_by_id = grocy.rearrange_by_id(products)
-    units = grocy.get_all_quantity_units()
-    convertions = grocy.get_all_quantity_unit_convertions()
-    barcodes = grocy.get_all_product_barcodes()
     normalizer = IngredientNormalizer(barcodes,
                                       products,
                                       products_by_id,
@@ -1172,16 +1270,18 @@ def recipe_ingredients_checker(args: CliArgs,
 
 def human_agrees(question: str) -> bool:
     ''' Ask human a yes/no question '''
-    answer = input(question + ' [y/n]')
-    return 'y' in answer
+    answer = input(question + ' [y/n] ')
+    return answer.strip().lower().startswith('y')
 
 
 def battery_charge_cmd(args: CliArgs,
                        _: AppConfig,
                        grocy: GrocyApi) -> None:
     ''' Track battery charge cycle. '''
-    for battery_id in args.ids:
-        grocy.charge_battery(battery_id, args.at)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda battery_id: grocy.charge_battery(battery_id,
+                                                                  args.at),
+                          args.ids))
 
 
 def chore_did_cmd(args: CliArgs,
@@ -1194,13 +1294,22 @@ def chore_did_cmd(args: CliArgs,
             grocy.did_chore(chore_id, args.at, args.skip)
         return
     now = datetime.now()
-    if not args.all:
-        for chore in grocy.get_overdue_chores(now):
-            if human_agrees(f'Completed {chore["chore_name"]}?'):
-                grocy.did_chore(chore['id'], args.at, args.skip)
-    for choreFull in grocy.get_scheduled_manual_chores(now, args.all):
-        if human_agrees(f'Completed {choreFull["name"]}?'):
-            grocy.did_chore(chore['id'], args.at, args.skip)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        scheduled_future = executor.submit(grocy.get_scheduled_manual_chores,
+                                           now, args.all)
+        overdue = [] if args.all else grocy.get_overdue_chores(now)
+        scheduled = scheduled_future.result()
+    done: list[int] = []
+    done.extend(chore['id']
+                for chore in overdue
+                if human_agrees(f'Completed {chore["chore_name"]}?'))
+    done.extend(choreFull['id']
+                for choreFull in scheduled
+                if human_agrees(f'Completed {choreFull["name"]}?'))
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda chore_id: grocy.did_chore(chore_id, args.at,
+                                                           args.skip),
+                          done))
 
 
 def chore_schedule_cmd(args: CliArgs,
@@ -1280,6 +1389,9 @@ to_datetime = {'now': datetime.now(),
                }
 
 
+TODOTXT_CHORE_ID_REGEX = re.compile(r'chore:(\d+)')
+
+
 def todotxt_chore_pull(args: TodotxtArgs,
                        config: AppConfig,
                        grocy: GrocyApi,
@@ -1293,10 +1405,9 @@ def todotxt_chore_pull(args: TodotxtArgs,
                          else lambda _, __: False)
     todo_file = args.environ.TODO_FILE
     new_content = []
-    regex = re.compile(r'chore:(\d+)')
     with open(todo_file, 'r') as f:
         for line in f:
-            match_ = regex.search(line)
+            match_ = TODOTXT_CHORE_ID_REGEX.search(line)
             if match_ is None:
                 new_content.append(line)
             elif line.startswith('x '):
@@ -1307,24 +1418,26 @@ def todotxt_chore_pull(args: TodotxtArgs,
                 new_content.append(line)
     copyfile(todo_file, todo_file + ".bak")
     with open(todo_file, 'w') as f:
-        for line in new_content:
-            f.write(line)
+        f.writelines(new_content)
         if pull_from_grocy:
             chore_show_cmd(args, config, grocy, f)
 
 
+TODOTXT_CHORE_PUSH_REGEX = re.compile(
+    r'^x (\d{4}-\d{2}-\d{2}) (?:.* )?\+auto '
+    r'|^x (\d{4}-\d{2}-\d{2}) (?:.* )?chore:(\d+)'
+    r'|chore:(\d+) (?:.* )?t:(\d{4}-\d{2}-\d{2})'
+    r'|^\(S\) (?:.* )?chore:(\d+)')
+
+
 def todotxt_chore_push(args: TodotxtArgs,
                        _: AppConfig,
                        grocy: GrocyApi) -> None:
     ''' Send completed and rescheduled_date chores in todo.txt to grocy '''
     time = datetime.now().strftime('%H:%M:%S')
-    regex = re.compile(r'^x (\d{4}-\d{2}-\d{2}) (?:.* )?\+auto '
-                       r'|^x (\d{4}-\d{2}-\d{2}) (?:.* )?chore:(\d+)'
-                       r'|chore:(\d+) (?:.* )?t:(\d{4}-\d{2}-\d{2})'
-                       r'|^\(S\) (?:.* )?chore:(\d+)')
     with open(args.environ.TODO_FILE, 'r') as f:
         for line in f:
-            match_ = regex.search(line)
+            match_ = TODOTXT_CHORE_PUSH_REGEX.search(line)
             if match_ is None or match_.group(1) is not None:
                 continue
             if match_.group(2) is not None:
@@ -1350,6 +1463,7 @@ def userfield_cmd(args: CliArgs,
                   _: AppConfig,
                   grocy: GrocyApi) -> None:
     ''' Quickly add userfields '''
+    import yaml
     try:
         for item in yaml.safe_load(args.file):
             try:
@@ -1383,6 +1497,7 @@ def chore_show_cmd(args: AppArgs,
                 print("---")
                 print(choreFull["description"])
             if (outfile is sys.stdout and fields is not None):
+                import yaml
                 print("---")
                 print(yaml.dump(fields))
                 print()
@@ -1424,10 +1539,14 @@ def find_item(args: CliArgs,
               _: AppConfig,
               grocy: GrocyApi) -> None:
     ''' Find default location of a product '''
+    try:
+        regex = re.compile(args.regex, re.I)
+    except re.error as ex:
+        raise UserError(f"Invalid regex '{args.regex}': {ex}") from ex
     locations = grocy.get_location_names()
     products = [p
                 for (name, p) in grocy.get_all_products().items()
-                if re.search(args.regex, name, re.I)]
+                if regex.search(name)]
     print('\n'.join(f'{p["name"]}: {locations[p["location_id"]]}'
                     for p in products))
 
@@ -1601,12 +1720,19 @@ def get_argparser(stores: Iterable[Store]) -> ArgumentParser:
 def find_shopping_location_for(store: str,
                                options: Iterable[GrocyShoppingLocation]
                                ) -> GrocyShoppingLocation:
-    ''' Find the grocy shopping location for given `store`'''
+    ''' Find the grocy shopping location for given `store`
+
+    >>> find_shopping_location_for('netto', [{'id': 1, 'name': 'Rewe'},
+    ...                                      {'id': 2, 'name': 'Netto Süd'},
+    ...                                      {'id': 3, 'name': 'Netto'}])
+    {'id': 3, 'name': 'Netto'}
+    '''
     try:
-        return sorted(filter(lambda o: o['name'].lower().startswith(store),
-                             options),
-                      key=lambda o: o['name'].lower())[0]
-    except IndexError as ex:
+        return min(((name, option)
+                    for option in options
+                    if (name := option['name'].lower()).startswith(store)),
+                   key=itemgetter(0))[1]
+    except ValueError as ex:
         raise UserError(f"No shopping location found for '{store}'.") from ex
 
 
@@ -1618,12 +1744,30 @@ def get_shopping_location_id(store: Literal['netto', 'rewe'],
     try:
         return int(config[store]['shopping_location_id'])
     except KeyError:
-        return find_shopping_location_for(store,
-                                          grocy.get_all_shopping_locations()
-                                          )['id']
+        return find_shopping_location_for(
+            store, grocy.get_shopping_locations_like(store))['id']
+
+
+ConvertionIndex = dict[tuple[int, int, Optional[int]], float]
+
+
+def index_convertions(convertions: Iterable[GrocyQUnitConvertion]
+                      ) -> ConvertionIndex:
+    '''
+    Index quantity unit convertions by (from_qu_id, to_qu_id, product_id).
+
+    >>> index_convertions([{'id': 1, 'from_qu_id': 7, 'to_qu_id': 42,
+    ...                     'product_id': None, 'factor': 1.5}])
+    {(7, 42, None): 1.5}
+    '''
+    index: ConvertionIndex = {}
+    for c in convertions:
+        index.setdefault((c['from_qu_id'], c['to_qu_id'], c['product_id']),
+                         c['factor'])
+    return index
 
 
-def convert_unit(convertions: Iterable[GrocyQUnitConvertion],
+def convert_unit(convertions: ConvertionIndex,
                  from_qu_id: int,
                  to_qu_id: int,
                  product_id: Optional[int]
@@ -1631,57 +1775,58 @@ def convert_unit(convertions: Iterable[GrocyQUnitConvertion],
     '''
     The factor for a unit convertion for a given product.
 
-    >>> convert_unit([], 42, 42, None)
+    >>> convert_unit({}, 42, 42, None)
     1
-    >>> convert_unit([{'id': 1, 'from_qu_id': 7, 'to_qu_id': 42,
-    ...                'product_id': None, 'factor': 1.5}
-    ...              ], 7, 42, None)
+    >>> convert_unit(index_convertions(
+    ...     [{'id': 1, 'from_qu_id': 7, 'to_qu_id': 42,
+    ...       'product_id': None, 'factor': 1.5}
+    ...      ]), 7, 42, None)
     1.5
-    >>> convert_unit([{'id': 1, 'from_qu_id': 7, 'to_qu_id': 42,
-    ...                'product_id': 121, 'factor': 3.5}
-    ...              ], 7, 42, 121)
+    >>> convert_unit(index_convertions(
+    ...     [{'id': 1, 'from_qu_id': 7, 'to_qu_id': 42,
+    ...       'product_id': 121, 'factor': 3.5}
+    ...      ]), 7, 42, 121)
     3.5
-    >>> convert_unit([{'id': 1, 'from_qu_id': 7, 'to_qu_id': 42,
-    ...                'product_id': 121, 'factor': 3.5},
-    ...               {'id': 1, 'from_qu_id': 7, 'to_qu_id': 42,
-    ...                'product_id': None, 'factor': 1.5},
-    ...              ], 7, 42, 121)
+    >>> convert_unit(index_convertions(
+    ...     [{'id': 1, 'from_qu_id': 7, 'to_qu_id': 42,
+    ...       'product_id': 121, 'factor': 3.5},
+    ...      {'id': 1, 'from_qu_id': 7, 'to_qu_id': 42,
+    ...       'product_id': None, 'factor': 1.5},
+    ...      ]), 7, 42, 121)
     3.5
-    >>> convert_unit([{'id': 1, 'from_qu_id': 7, 'to_qu_id': 42,
-    ...                'product_id': 121, 'factor': 3.5},
-    ...               {'id': 1, 'from_qu_id': 7, 'to_qu_id': 42,
-    ...                'product_id': None, 'factor': 1.5},
-    ...              ], 7, 42, None)
+    >>> convert_unit(index_convertions(
+    ...     [{'id': 1, 'from_qu_id': 7, 'to_qu_id': 42,
+    ...       'product_id': 121, 'factor': 3.5},
+    ...      {'id': 1, 'from_qu_id': 7, 'to_qu_id': 42,
+    ...       'product_id': None, 'factor': 1.5},
+    ...      ]), 7, 42, None)
     1.5
-    >>> convert_unit([{'id': 1, 'from_qu_id': 7, 'to_qu_id': 42,
-    ...                'product_id': 121, 'factor': 3.5},
-    ...               {'id': 1, 'from_qu_id': 7, 'to_qu_id': 42,
-    ...                'product_id': None, 'factor': 1.5},
-    ...              ], 7, 42, 144)
+    >>> convert_unit(index_convertions(
+    ...     [{'id': 1, 'from_qu_id': 7, 'to_qu_id': 42,
+    ...       'product_id': 121, 'factor': 3.5},
+    ...      {'id': 1, 'from_qu_id': 7, 'to_qu_id': 42,
+    ...       'product_id': None, 'factor': 1.5},
+    ...      ]), 7, 42, 144)
     1.5
     '''
     if from_qu_id == to_qu_id:
         return 1
     try:
-        return sorted([c
-                       for c in convertions
-                       if c['from_qu_id'] == from_qu_id
-                       and c['to_qu_id'] == to_qu_id
-                       and c['product_id'] in [None, product_id]],
-                      key=lambda o: o['product_id'] is None
-                      )[0]['factor']
-    except IndexError as ex:
+        return convertions[(from_qu_id, to_qu_id, product_id)]
+    except KeyError:
+        pass
+    try:
+        return convertions[(from_qu_id, to_qu_id, None)]
+    except KeyError as ex:
         raise UserError(f'No convertion found for {from_qu_id} to {to_qu_id}'
                         f' for {product_id}') from ex
 
 
 def format_shopping_list_item(item: GrocyShoppingListItem,
-                              known_products: dict[int, GrocyProduct],
+                              product: GrocyProduct,
                               units: dict[int, GrocyQuantityUnit],
-                              _: dict[int, GrocyProductGroup]
                               ) -> str:
     ''' Format shopping list item in todo.txt format '''
-    product = known_products[item["product_id"]]
     name = product["name"]
     unit = units[item["qu_id"]]["name_plural"]
     return f'{name}, {item["amount"]}{unit}'
@@ -1691,19 +1836,26 @@ def export_shopping_list(_: CliArgs,
                          __: AppConfig,
                          grocy: GrocyApi) -> None:
     ''' export shopping list to todo.txt '''
-    known_products = grocy.get_all_products_by_id()
-    shopping_list = grocy.get_all_shopping_list()
-    units = grocy.get_all_quantity_units_by_id()
-    groups = grocy.get_all_product_groups()
-
-    def product_group_id(item: GrocyShoppingListItem) -> int:
-        return known_products[item['product_id']]['product_group_id'] or 0
-
-    print('\n'.join(format_shopping_list_item(item,
-                                              known_products,
-                                              units,
-                                              groups)
-                    for item in sorted(shopping_list, key=product_group_id)))
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        products_future = executor.submit(grocy.get_all_products_by_id)
+        shopping_list_future = executor.submit(grocy.get_all_shopping_list)
+        units_future = executor.submit(grocy.get_all_quantity_units_by_id)
+        known_products = products_future.result()
+        shopping_list = shopping_list_future.result()
+        units = units_future.result()
+
+    annotated: list[tuple[int, GrocyProduct, GrocyShoppingListItem]] = []
+    for item in shopping_list:
+        product = known_products[item['product_id']]
+        annotated.append((product['product_group_id'] or 0, product, item))
+    annotated.sort(key=itemgetter(0))
+    if not annotated:
+        # Keep the single empty line printed for an empty list
+        print()
+    sys.stdout.writelines(format_shopping_list_item(item,
+                                                    product,
+                                                    units) + '\n'
+                          for _, product, item in annotated)
 
 
 def load_config() -> Tuple[AppConfig, str]:
@@ -1725,7 +1877,9 @@ def load_config() -> Tuple[AppConfig, str]:
 def main() -> None:
     ''' Run the CLI program '''
     argparser = get_argparser([Netto(), Rewe(), Ebon()])
-    argcomplete.autocomplete(argparser)
+    if '_ARGCOMPLETE' in environ:
+        import argcomplete
+        argcomplete.autocomplete(argparser)
     args = cast(AppArgs, argparser.parse_args())
     config, config_path = load_config()
     try:
@@ -12,11 +12,11 @@ setup(name='grocy_importer',
       scripts=['grocy_importer.py'],
       install_requires=[
             'bs4',
+            'soupsieve',
             'requests',
-            'marshmallow',
             'appdirs',
             'argcomplete',
             'pdfminer.six',
-            'html5lib',
+            'lxml',
             'pyyaml',
           ])